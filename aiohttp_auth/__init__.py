@@ -2,21 +2,108 @@
 from .auth import auth_middleware
 from .autz import autz_middleware
 from .acl import acl_middleware
-from . import auth, autz
+from . import acl, auth, autz
+from .auth.abstract_auth import AbstractAuthentication
+from .auth.auth import POLICY_KEY
+from .autz.abc import AbstractAutzPolicy
+from .autz.autz import AUTZ_POLICY_KEY
+from .utils import is_installed, mark_middleware
 
 
 __version__ = '0.2.2'
 
 
 def setup(app, auth_policy, autz_policy):
-    """Setup auth and autz middleware in aiohttp fashion.
+    """Setup auth and autz (or acl) middleware in aiohttp fashion.
+
+    If ``autz_policy`` is a callable but not an authorization policy it is
+    taken as an ``acl`` groups callback and the ``acl`` middleware is
+    installed instead of the ``autz`` one.
 
     Args:
         app: aiohttp Application object.
+        auth_policy: An authentication policy with a base class of
+            AbstractAuthentication.
+        autz_policy: An authorization policy with a base class of
+            AbstractAutzPolicy, or an ``acl`` groups callback (see
+            ``aiohttp_auth.acl.setup``).
+
+    Raises:
+        TypeError: If ``autz_policy`` is neither an authorization policy nor
+            a callable.
+    """
+    if isinstance(autz_policy, AbstractAutzPolicy):
+        auth.setup(app, auth_policy)
+        autz.setup(app, autz_policy)
+    elif callable(autz_policy):
+        auth.setup(app, auth_policy)
+        acl.setup(app, autz_policy)
+    else:
+        raise TypeError('autz_policy should be an AbstractAutzPolicy or an '
+                        'acl groups callback, got {!r}'.format(autz_policy))
+
+
+def auth_autz_middleware(auth_policy, autz_policy):
+    """Return a middleware factory doing the work of both auth and autz ones.
+
+    The middleware behaves as ``auth_middleware`` followed by
+    ``autz_middleware`` but takes a single step in the middleware chain of
+    every request.
+
+    Args:
         auth_policy: An authentication policy with a base class of
             AbstractAuthentication.
         autz_policy: An authorization policy with a base class of
             AbstractAutzPolicy
+
+    Returns:
+        An ``aiohttp`` middleware factory.
     """
-    auth.setup(app, auth_policy)
-    autz.setup(app, autz_policy)
+    assert isinstance(auth_policy, AbstractAuthentication)
+    assert isinstance(autz_policy, AbstractAutzPolicy)
+
+    async def _middleware_factory(app, handler):
+
+        async def _middleware_handler(request):
+            # Save the policies in the request
+            request[POLICY_KEY] = auth_policy
+            request[AUTZ_POLICY_KEY] = autz_policy
+
+            # Call the next handler in the chain
+            response = await handler(request)
+
+            # Give the auth policy a chance to handle the response
+            await auth_policy.process_response(request, response)
+
+            return response
+
+        return _middleware_handler
+
+    return mark_middleware(_middleware_factory, ('auth', auth_policy),
+                           ('autz', autz_policy))
+
+
+def setup_combined(app, auth_policy, autz_policy):
+    """Setup auth and autz as a single middleware in aiohttp fashion.
+
+    Works as ``setup`` but installs one ``auth_autz_middleware`` instead of
+    two separate middlewares. If one of the policies is already set up only
+    the middleware of the other one is installed, and nothing is done if both
+    are.
+
+    Args:
+        app: aiohttp Application object.
+        auth_policy: An authentication policy with a base class of
+            AbstractAuthentication.
+        autz_policy: An authorization policy with a base class of
+            AbstractAutzPolicy
+    """
+    auth_installed = is_installed(app, 'auth', auth_policy)
+    autz_installed = is_installed(app, 'autz', autz_policy)
+
+    if not (auth_installed or autz_installed):
+        app.middlewares.append(auth_autz_middleware(auth_policy, autz_policy))
+    elif not autz_installed:
+        autz.setup(app, autz_policy)
+    elif not auth_installed:
+        auth.setup(app, auth_policy)
@@ -2,3 +2,4 @@ from .acl import acl_middleware, get_permitted
 from .acl import get_user_groups
 from .acl import setup
 from .decorators import acl_required
+from .context import ACLContext, NaiveACLContext, freeze_context
@@ -59,3 +59,27 @@ class AbstractACLGroupsCallback(abc.ABC):
 
     def __call__(self, user_id):
         return self.acl_groups(user_id)
+
+
+class AbstractACLContext(abc.ABC):
+    """Abstract base class for ACL contexts.
+
+    An ACL context object holds a sequence of ACL tuples in a form suitable
+    for fast permission checks. Objects of subclasses can be used in place of
+    plain sequences of ACL tuples everywhere a context is expected.
+    """
+
+    @abc.abstractmethod
+    def permit(self, groups, permission):
+        """Check if one of the groups has the requested permission.
+
+        Args:
+            groups: A set of ACL groups (already extended with
+                ``Group.Everyone`` and ``Group.AuthenticatedUser``).
+            permission: The specific permission requested.
+
+        Returns:
+            ``True`` if the groups are allowed the requested permission,
+            ``False`` otherwise.
+        """
+        pass  # pragma: no cover
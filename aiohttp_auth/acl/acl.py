@@ -1,11 +1,17 @@
 """ACL middleware."""
 import itertools
 from ..auth import get_auth
-from ..permissions import Permission, Group
+from ..permissions import Group
+from ..utils import is_installed, mark_middleware
+from .abc import AbstractACLContext
+from .context import naive_permit
 
 
 GROUPS_KEY = 'aiohttp_auth.acl.callback'
 
+"""Key used to cache the user groups in the request object"""
+USER_GROUPS_KEY = 'aiohttp_auth.acl.user_groups'
+
 
 def acl_middleware(callback):
     """Return ACL middleware factory.
@@ -34,14 +40,16 @@ def acl_middleware(callback):
 
         return _middleware_handler
 
-    return _acl_middleware_factory
+    return mark_middleware(_acl_middleware_factory, ('acl', callback))
 
 
 async def get_user_groups(request):
     """Return the groups that the user in this request has access to.
 
     This function gets the user id from the auth.get_auth function, and passes
-    it to the ACL callback function to get the groups.
+    it to the ACL callback function to get the groups. The groups are cached
+    in the request for the user id, so the callback is called once per
+    request unless the user changes (e.g. by ``auth.remember``).
 
     Args:
         request: aiohttp Request object.
@@ -61,9 +69,15 @@ async def get_user_groups(request):
         raise RuntimeError('acl_middleware not installed')
 
     user_id = await get_auth(request)
-    groups = await acl_callback(user_id)
 
-    return extend_user_groups(user_id, groups)
+    cached = request.get(USER_GROUPS_KEY)
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+
+    groups = extend_user_groups(user_id, await acl_callback(user_id))
+
+    request[USER_GROUPS_KEY] = (user_id, groups)
+    return groups
 
 
 def extend_user_groups(user_id, groups):
@@ -75,16 +89,16 @@ def extend_user_groups(user_id, groups):
 
     Returns:
         If groups is None, this function returns None.
-        Otherwise this function extends groups with the Everyone group.
-        If user_id is not None, the AuthnticatedUser group is added to the
-        groups returned by the function.
+        Otherwise this function returns a frozenset of groups extended with
+        the Everyone group. If user_id is not None, the AuthnticatedUser group
+        is added to the groups returned by the function.
     """
     if groups is None:
         return None
 
     user_groups = (Group.AuthenticatedUser, ) if user_id is not None else ()
 
-    return set(itertools.chain(groups, (Group.Everyone,), user_groups))
+    return frozenset(itertools.chain(groups, (Group.Everyone,), user_groups))
 
 
 async def get_permitted(request, permission, context):
@@ -110,10 +124,14 @@ async def get_permitted(request, permission, context):
     Groups and permissions need only be immutable objects, so can be strings,
     numbers, enumerations, or other immutable objects.
 
+    A context which is checked often can be compiled once with
+    ``aiohttp_auth.acl.context.ACLContext`` and passed instead of the
+    sequence of ACL tuples.
+
     Args:
         request: aiohttp Request object.
         permission: The specific permission requested.
-        context: A sequence of ACL tuples.
+        context: A sequence of ACL tuples or an ACL context object.
 
     Returns:
         The function gets the groups by calling get_user_groups() and returns
@@ -124,6 +142,9 @@ async def get_permitted(request, permission, context):
         RuntimeError: If the ACL middleware is not installed.
     """
     groups = await get_user_groups(request)
+    if groups is None:
+        return False
+
     return get_groups_permitted(groups, permission, context)
 
 
@@ -133,7 +154,7 @@ def get_groups_permitted(groups, permission, context):
     Args:
         groups: A set of ACL groups.
         permission: The specific permission requested.
-        context: A sequence of ACL tuples.
+        context: A sequence of ACL tuples or an ACL context object.
 
     Returns:
         True if the groups are Allowed the requested permission, False
@@ -142,17 +163,18 @@ def get_groups_permitted(groups, permission, context):
     if groups is None:
         return False
 
-    for action, group, permissions in context:
-        if group in groups:
-            if permission in permissions:
-                return action == Permission.Allow
+    if isinstance(context, AbstractACLContext):
+        return context.permit(groups, permission)
 
-    return False
+    return naive_permit(context, groups, permission)
 
 
 def setup(app, groups_callback):
     """Setup middleware in aiohttp fashion.
 
+    Nothing is done if the middleware is already set up with the same
+    callback.
+
     Args:
         app: aiohttp Application object.
         groups_callback: This is a callable which takes a user_id (as returned
@@ -162,4 +184,5 @@ def setup(app, groups_callback):
             this particular user_id. Note that the user_id passed may be None
             if no authenticated user exists.
     """
-    app.middlewares.append(acl_middleware(groups_callback))
+    if not is_installed(app, 'acl', groups_callback):
+        app.middlewares.append(acl_middleware(groups_callback))
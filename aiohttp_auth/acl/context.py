@@ -0,0 +1,274 @@
+"""ACL contexts.
+
+A plain ACL context is a sequence of ACL tuples which is walked rule by rule
+on every permission check. The classes of this module take such a sequence
+once and keep it in a form which is cheaper to check against.
+"""
+import sys
+from functools import lru_cache
+from ..permissions import Permission
+from .abc import AbstractACLContext
+
+
+def _intern(value):
+    # Only exact strings can be interned, other immutable objects are kept.
+    if type(value) is str:
+        return sys.intern(value)
+
+    return value
+
+
+def _normalize_permissions(permissions):
+    # ('edit') is a common typo for ('edit',), treat a string as a single
+    # permission rather than a sequence of characters.
+    if isinstance(permissions, str):
+        return (permissions, )
+
+    return permissions
+
+
+def is_empty_context(context):
+    """Check if context is known to have no ACL rules.
+
+    Args:
+        context: A sequence of ACL tuples or an ACL context object.
+
+    Returns:
+        ``True`` if context has no rules, ``False`` if it has rules or its
+        size is unknown (e.g. an iterator).
+    """
+    return hasattr(context, '__len__') and len(context) == 0
+
+
+def naive_permit(context, groups, permission):
+    """Check permission by walking a sequence of ACL tuples in order.
+
+    Args:
+        context: A sequence of ACL tuples.
+        groups: A set of ACL groups.
+        permission: The specific permission requested.
+
+    Returns:
+        ``True`` if the groups are allowed the requested permission,
+        ``False`` otherwise.
+    """
+    for action, group, permissions in context:
+        if group in groups:
+            if permission in permissions:
+                return action is Permission.Allow
+
+    return False
+
+
+def _merge_rules(rules):
+    # The first matching rule wins, so a run of rules with the same action
+    # matches if any of its groups matches (and the action is the same).
+    merged = []
+    for allowed, group in rules:
+        if merged and merged[-1][0] == allowed:
+            merged[-1][1].add(group)
+        else:
+            merged.append((allowed, {group}))
+
+    return tuple((allowed, frozenset(groups)) for allowed, groups in merged)
+
+
+def _first_rules(rules):
+    # Map every group to the index and the action of its first rule.
+    first = {}
+    for index, (allowed, group) in enumerate(rules):
+        first.setdefault(group, (index, allowed))
+
+    return first
+
+
+@lru_cache(maxsize=128)
+def _compile_permit(rules):
+    # Generate a permit function with the rules unrolled, e.g.:
+    #
+    #   def permit(groups, permission):
+    #       if _group0 in groups and permission in _permissions0:
+    #           return True
+    #       ...
+    #       return False
+    #
+    # Groups and permissions are passed through the namespace, so they need
+    # not have a repr which evaluates back to them.
+    namespace = {}
+    lines = ['def permit(groups, permission):']
+    for index, (allowed, group, permissions) in enumerate(rules):
+        namespace['_group{}'.format(index)] = group
+        namespace['_permissions{}'.format(index)] = permissions
+        lines.append('    if (_group{0} in groups and '
+                     'permission in _permissions{0}):'.format(index))
+        lines.append('        return {!r}'.format(allowed))
+
+    lines.append('    return False')
+
+    exec('\n'.join(lines), namespace)
+    return namespace['permit']
+
+
+class NaiveACLContext(AbstractACLContext):
+    """ACL context which checks rules one by one in declaration order.
+
+    This is the reference implementation of ACL checks. It gives the same
+    results as passing a plain sequence of ACL tuples, except for a string
+    given as the permissions of a rule: it is taken as a single permission,
+    while a plain sequence allows any substring of it (e.g. ``'ed'`` for
+    ``'edit'``).
+
+    A context of up to ``max_unrolled_rules`` rules is compiled into a
+    function with the rule checks unrolled in declaration order. Compiled
+    functions are shared by contexts with the same rules.
+    """
+
+    max_unrolled_rules = 32
+
+    def __init__(self, context):
+        """Initialize naive ACL context.
+
+        Args:
+            context: A sequence of ACL tuples.
+        """
+        self._rules = tuple(
+            (action, group, _normalize_permissions(permissions))
+            for action, group, permissions in context)
+
+        if len(self._rules) <= self.max_unrolled_rules:
+            try:
+                self.permit = _compile_permit(tuple(
+                    (action is Permission.Allow, group,
+                     frozenset(permissions))
+                    for action, group, permissions in self._rules))
+            except TypeError:
+                # unhashable groups or permissions, keep the generic check
+                pass
+
+    def __len__(self):
+        return len(self._rules)
+
+    def permit(self, groups, permission):
+        return naive_permit(self._rules, groups, permission)
+
+
+class ACLContext(AbstractACLContext):
+    """ACL context indexed by permission.
+
+    Rules are grouped by permission when the context is created, so a
+    permission check only looks at the rules which mention the requested
+    permission, still in declaration order. Consecutive rules of a permission
+    with the same action are merged into one set of groups, which is checked
+    against the user groups with a single set operation.
+
+    If a permission has more than ``max_scanned_rules`` rules left after
+    merging, the first rule of every group is indexed instead, and a check
+    costs one lookup per user group whatever the number of rules is.
+
+    Note that the context is copied on creation, so later changes of the
+    passed sequence are not seen by the ``ACLContext`` object. String groups
+    and permissions are interned, see ``intern_permission``. As in
+    ``NaiveACLContext`` a string given as the permissions of a rule is taken
+    as a single permission.
+
+    Usage example:
+
+    .. code-block:: python
+
+        from aiohttp_auth.acl.context import ACLContext
+        from aiohttp_auth.permissions import Permission
+
+        context = ACLContext([(Permission.Allow, 'view_group', {'view', }),
+                              (Permission.Allow, 'edit_group', {'edit', })])
+
+    """
+
+    max_scanned_rules = 8
+
+    def __init__(self, context):
+        """Initialize ACL context.
+
+        Args:
+            context: A sequence of ACL tuples.
+        """
+        by_permission = {}
+        self._size = 0
+        for action, group, permissions in context:
+            self._size += 1
+            allowed = action is Permission.Allow
+            group = _intern(group)
+            for permission in _normalize_permissions(permissions):
+                by_permission.setdefault(_intern(permission), []).append(
+                    (allowed, group))
+
+        # Permissions with a few (merged) rules are checked by scanning them,
+        # for the others the first matching rule is looked up by group.
+        self._by_permission = {}
+        self._first_rules = {}
+        for permission, rules in by_permission.items():
+            merged = _merge_rules(rules)
+            if len(merged) <= self.max_scanned_rules:
+                self._by_permission[permission] = merged
+            else:
+                self._first_rules[permission] = _first_rules(rules)
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def intern_permission(permission):
+        """Return the interned version of permission.
+
+        Permissions built at runtime (e.g. by string formatting) can be
+        interned before checking them, so the lookup in the context compares
+        them by identity.
+
+        Args:
+            permission: The permission to intern.
+
+        Returns:
+            The interned string if permission is a string, otherwise the
+            permission itself.
+        """
+        return _intern(permission)
+
+    def permit(self, groups, permission):
+        rules = self._by_permission.get(permission)
+        if rules is not None:
+            for allowed, rule_groups in rules:
+                if not rule_groups.isdisjoint(groups):
+                    return allowed
+
+            return False
+
+        first_rules = self._first_rules.get(permission)
+        if first_rules is None:
+            return False
+
+        found = None
+        for group in groups:
+            rule = first_rules.get(group)
+            if rule is not None and (found is None or rule < found):
+                found = rule
+
+        return found is not None and found[1]
+
+
+def freeze_context(context):
+    """Return context compiled into an ACL context object.
+
+    Use it for contexts which are defined once and checked often, e.g. at
+    module level. The returned object can be passed everywhere a context is
+    expected.
+
+    Args:
+        context: A sequence of ACL tuples or an ACL context object.
+
+    Returns:
+        ``ACLContext`` for a sequence of ACL tuples, or context itself if it
+        is already an ACL context object.
+    """
+    if isinstance(context, AbstractACLContext):
+        return context
+
+    return ACLContext(context)
@@ -1,11 +1,15 @@
 """ACL middleware decorators."""
 
+import asyncio
+import inspect
 from functools import wraps
 from aiohttp import web
+from ..utils import request_getter
 from .acl import get_permitted
+from .context import freeze_context, is_empty_context
 
 
-def acl_required(permission, context):
+def acl_required(permission, context, cache_ttl=0):
     """Create decorator to check given permission with given context.
 
     Return a decorator that checks if a user has the requested permission
@@ -20,8 +24,14 @@ def acl_required(permission, context):
     Args:
         permission: The specific permission requested.
         context: Either a sequence of ACL tuples, or a callable that returns a
-            sequence of ACL tuples. For more information on ACL tuples, see
-            ``get_permission()``.
+            sequence of ACL tuples (or an awaitable of it). For more
+            information on ACL tuples, see ``get_permission()``. A sequence
+            is compiled with ``freeze_context()`` when the handler is
+            decorated, so later changes of it are not seen.
+        cache_ttl: Number of seconds to reuse the value returned by a callable
+            context. The callable is called on every request if the value is
+            ``0`` (default). While the value is being refreshed concurrent
+            requests wait for it instead of calling the callable again.
 
     Returns:
         A decorator which will check the request passed has the permission for
@@ -30,18 +40,74 @@ def acl_required(permission, context):
     """
     def decorator(func):
 
-        @wraps(func)
-        async def wrapper(*args):
-            request = (args[-1].request
-                       if isinstance(args[-1], web.View)
-                       else args[-1])
+        state = {'loop': None, 'lock': None, 'value': None, 'expires': 0.0}
 
-            context_value = context() if callable(context) else context
+        async def cached_context():
+            loop = asyncio.get_event_loop()
+            if state['loop'] is not loop:
+                state.update(loop=loop, lock=asyncio.Lock(), expires=0.0)
 
-            if await get_permitted(request, permission, context_value):
-                return await func(*args)
+            if loop.time() < state['expires']:
+                return state['value']
 
-            raise web.HTTPForbidden()
+            async with state['lock']:
+                if loop.time() >= state['expires']:
+                    value = context()
+                    if inspect.isawaitable(value):
+                        value = await value
+
+                    state['value'] = freeze_context(value)
+                    state['expires'] = loop.time() + cache_ttl
+
+            return state['value']
+
+        get_request = request_getter(func)
+
+        if not callable(context):
+            if is_empty_context(context):
+                # no rule can allow anything, do not even look up the groups
+                @wraps(func)
+                async def wrapper(*args):
+                    raise web.HTTPForbidden()
+
+                return wrapper
+
+            frozen_context = freeze_context(context)
+
+            @wraps(func)
+            async def wrapper(*args):
+                if await get_permitted(get_request(args), permission,
+                                       frozen_context):
+                    return await func(*args)
+
+                raise web.HTTPForbidden()
+
+            return wrapper
+
+        get_context = cached_context if cache_ttl > 0 else context
+
+        if inspect.iscoroutinefunction(get_context):
+            @wraps(func)
+            async def wrapper(*args):
+                if await get_permitted(get_request(args), permission,
+                                       await get_context()):
+                    return await func(*args)
+
+                raise web.HTTPForbidden()
+
+        else:
+            @wraps(func)
+            async def wrapper(*args):
+                # a callable object may still return an awaitable
+                context_value = get_context()
+                if inspect.isawaitable(context_value):
+                    context_value = await context_value
+
+                if await get_permitted(get_request(args), permission,
+                                       context_value):
+                    return await func(*args)
+
+                raise web.HTTPForbidden()
 
         return wrapper
 
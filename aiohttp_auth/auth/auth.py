@@ -1,4 +1,5 @@
 """Athentication middleware."""
+from ..utils import is_installed, mark_middleware
 from .abstract_auth import AbstractAuthentication
 
 """Key used to store the auth policy in the request object"""
@@ -35,12 +36,15 @@ def auth_middleware(policy):
 
         return _middleware_handler
 
-    return _auth_middleware_factory
+    return mark_middleware(_auth_middleware_factory, ('auth', policy))
 
 
 async def get_auth(request):
     """Return the user_id associated with a particular request.
 
+    The user_id (or None) is cached in the request, so the policy is asked
+    once per request until ``remember()`` or ``forget()`` is called.
+
     Args:
         request: aiohttp Request object.
 
@@ -51,9 +55,8 @@ async def get_auth(request):
     Raises:
         RuntimeError: Middleware is not installed
     """
-    auth_val = request.get(AUTH_KEY)
-    if auth_val:
-        return auth_val
+    if AUTH_KEY in request:
+        return request[AUTH_KEY]
 
     auth_policy = request.get(POLICY_KEY)
     if auth_policy is None:
@@ -77,6 +80,7 @@ async def remember(request, user_id):
     if auth_policy is None:
         raise RuntimeError('auth_middleware not installed')
 
+    request.pop(AUTH_KEY, None)
     return await auth_policy.remember(request, user_id)
 
 
@@ -93,15 +97,19 @@ async def forget(request):
     if auth_policy is None:
         raise RuntimeError('auth_middleware not installed')
 
+    request.pop(AUTH_KEY, None)
     return await auth_policy.forget(request)
 
 
 def setup(app, policy):
     """Setup middleware in aiohttp fashion.
 
+    Nothing is done if the middleware is already set up with the same policy.
+
     Args:
         app: aiohttp Application object.
         policy: An authentication policy with a base class of
             AbstractAuthentication.
     """
-    app.middlewares.append(auth_middleware(policy))
+    if not is_installed(app, 'auth', policy):
+        app.middlewares.append(auth_middleware(policy))
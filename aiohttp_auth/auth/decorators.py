@@ -1,6 +1,7 @@
 """Authentication decorators."""
 from functools import wraps
 from aiohttp import web
+from ..utils import request_getter
 from .auth import get_auth
 
 
@@ -34,12 +35,11 @@ def auth_required(func):
         passed request does not have the correct permissions to access the
         view.
     """
+    get_request = request_getter(func)
+
     @wraps(func)
     async def wrapper(*args):
-        request = (args[-1].request
-                   if isinstance(args[-1], web.View)
-                   else args[-1])
-        if (await get_auth(request)) is None:
+        if (await get_auth(get_request(args))) is None:
             raise web.HTTPUnauthorized()
 
         return await func(*args)
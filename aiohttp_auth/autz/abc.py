@@ -14,6 +14,9 @@ class AbstractAutzPolicy(abc.ABC):
     async def permit(self, user_identity, permission, context):
         """Check if user has permission accoding to context.
 
+        Subclasses can implement it as a plain method as well, the result is
+        awaited by ``autz.permit`` only if it is awaitable.
+
         Args:
             user_identity: User identity returned from ``auth.get_auth``.
             permission: Permission method checks for.
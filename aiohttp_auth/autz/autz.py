@@ -1,5 +1,7 @@
 """Authorization middleware."""
+import inspect
 from ..auth import get_auth
+from ..utils import is_installed, mark_middleware
 from .abc import AbstractAutzPolicy
 
 
@@ -44,7 +46,7 @@ def autz_middleware(autz_policy):
 
         return _middleware_handler
 
-    return _middleware_factory
+    return mark_middleware(_middleware_factory, ('autz', autz_policy))
 
 
 async def permit(request, permission, context=None):
@@ -80,7 +82,11 @@ async def permit(request, permission, context=None):
     if policy is None:
         raise RuntimeError('autz_middleware not installed.')
 
-    return await policy.permit(user_identity, permission, context)
+    permitted = policy.permit(user_identity, permission, context)
+    if inspect.isawaitable(permitted):
+        permitted = await permitted
+
+    return permitted
 
 
 def setup(app, autz_policy):
@@ -90,9 +96,12 @@ def setup(app, autz_policy):
     ``autz`` middleware. So the preferred way to install this middleware is to
     use global ``aiohttp_auth.setup`` function.
 
+    Nothing is done if the middleware is already set up with the same policy.
+
     Args:
         app: aiohttp ``Application`` object.
         autz_policy: A subclass of
             ``aiohttp_auth.autz.abc.AbstractAutzPolicy``.
     """
-    app.middlewares.append(autz_middleware(autz_policy))
+    if not is_installed(app, 'autz', autz_policy):
+        app.middlewares.append(autz_middleware(autz_policy))
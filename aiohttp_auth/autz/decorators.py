@@ -1,6 +1,7 @@
 """Authorization decorators."""
 from functools import wraps
 from aiohttp import web
+from ..utils import request_getter
 from . import autz
 
 
@@ -33,13 +34,11 @@ def autz_required(permission, context=None):
     """
     def decorator(func):
 
+        get_request = request_getter(func)
+
         @wraps(func)
         async def wrapper(*args):
-            request = (args[-1].request
-                       if isinstance(args[-1], web.View)
-                       else args[-1])
-
-            if await autz.permit(request, permission, context):
+            if await autz.permit(get_request(args), permission, context):
                 return await func(*args)
 
             raise web.HTTPForbidden()
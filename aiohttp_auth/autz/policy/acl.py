@@ -5,7 +5,9 @@ create ACL authorization policy class. The subclass should define how to
 retrieve user's groups.
 """
 import abc
+import asyncio
 from ...acl.acl import extend_user_groups, get_groups_permitted
+from ...acl.context import freeze_context, is_empty_context
 from ..abc import AbstractAutzPolicy
 
 
@@ -40,6 +42,13 @@ class AbstractACLAutzPolicy(AbstractAutzPolicy):
     Groups and permissions need only be immutable objects, so can be strings,
     numbers, enumerations, or other immutable objects.
 
+    .. note:: A global context is compiled into an ``ACLContext`` when it is
+        assigned, so changes made to the original sequence afterwards are not
+        seen by the policy. Assign a new context to ``policy.context`` instead.
+
+    .. note:: Concurrent permission checks for the same user identity share
+        a single call of ``acl_groups``.
+
     .. note:: Groups that are returned by ``acl_groups`` (if they are not
         ``None``) will then be extended internally with ``Group.Everyone`` and
         ``Group.AuthenticatedUser``.
@@ -100,9 +109,22 @@ class AbstractACLAutzPolicy(AbstractAutzPolicy):
 
         Args:
             context: global ACL context, default to ``None``. Should be a list
-                of ACL rules.
+                of ACL rules or an ACL context object.
         """
         self.context = context
+        self._inflight_groups = {}
+
+    @property
+    def context(self):
+        """Global ACL context of the policy."""
+        return self._context
+
+    @context.setter
+    def context(self, context):
+        if context is not None:
+            context = freeze_context(context)
+
+        self._context = context
 
     @abc.abstractmethod
     async def acl_groups(self, user_identity):
@@ -148,6 +170,58 @@ class AbstractACLAutzPolicy(AbstractAutzPolicy):
                                'acl autz policy or passed as a parameter of '
                                'permit function or autz_required decorator.')
 
-        groups = extend_user_groups(user_identity,
-                                    await self.acl_groups(user_identity))
+        if is_empty_context(context):
+            return False
+
+        groups = await self._shared_acl_groups(user_identity)
+        if groups is None:
+            return False
+
+        groups = extend_user_groups(user_identity, groups)
         return get_groups_permitted(groups, permission, context)
+
+    async def _shared_acl_groups(self, user_identity):
+        # Concurrent permission checks for the same user share one call of
+        # acl_groups instead of calling it once per check. The first check
+        # calls acl_groups inline and publishes the result in a future the
+        # others wait for.
+        loop = asyncio.get_event_loop()
+        try:
+            inflight = self._inflight_groups.get(user_identity)
+        except TypeError:
+            # an unhashable identity cannot be shared, call acl_groups directly
+            return await self.acl_groups(user_identity)
+
+        if inflight is not None and inflight[0] is loop:
+            future = inflight[1]
+            try:
+                # shield the shared call from cancellation of a single waiter
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+
+            # the check running acl_groups was cancelled, not this one
+            return await self.acl_groups(user_identity)
+
+        if inflight is not None:
+            # another loop is running a check for the same user
+            return await self.acl_groups(user_identity)
+
+        future = loop.create_future()
+        self._inflight_groups[user_identity] = (loop, future)
+        try:
+            groups = await self.acl_groups(user_identity)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # waiters get the exception anyway, do not warn if there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(groups)
+            return groups
+        finally:
+            self._inflight_groups.pop(user_identity, None)
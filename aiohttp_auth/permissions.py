@@ -6,9 +6,16 @@ class Permission(Enum):
     Allow = True
     Deny = False
 
+    # Members are singletons, so the identity hash (computed in C) is enough
+    # and is much cheaper than Enum.__hash__.
+    __hash__ = object.__hash__
+
 
 @unique
 class Group(Enum):
     Everyone = 'aiohttp_auth.acl.group.Everyone'
     AuthenticatedUser = 'aiohttp_auth.acl.group.AuthenticatedUser'
 
+    # Groups are checked for membership in sets of user groups on every
+    # permission check, see Permission.__hash__.
+    __hash__ = object.__hash__
@@ -0,0 +1,106 @@
+"""Helpers shared by the middleware decorators."""
+import inspect
+from operator import itemgetter
+
+
+_POSITIONAL = (inspect.Parameter.POSITIONAL_ONLY,
+               inspect.Parameter.POSITIONAL_OR_KEYWORD)
+
+
+def _positional_parameters(func):
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return None
+
+    if any(p.kind == inspect.Parameter.VAR_POSITIONAL for p in parameters):
+        return None
+
+    return [p.name for p in parameters if p.kind in _POSITIONAL]
+
+
+def _view_request(args):
+    return args[-1].request
+
+
+def _any_request(args):
+    # web.View (and only it) exposes the request as an attribute
+    last = args[-1]
+    return getattr(last, 'request', last)
+
+
+def request_getter(func):
+    """Return a function to get the request from the arguments of a handler.
+
+    The kind of the handler is determined once, when it is decorated, so
+    decorators do not need to check it on every request:
+
+        - a method ``async def get(self)`` defined in a class body is treated
+          as a ``web.View`` method, the request is ``self.request``;
+        - a method ``async def handler(self, request)`` defined in a class
+          body gets the request as the last argument;
+        - for anything else, including a function ``async def
+          handler(request)`` (which may as well be a wrapped ``web.View``
+          method), the last argument is checked on every call: its
+          ``request`` attribute is used if it has one, the argument itself
+          otherwise.
+
+    Args:
+        func: Handler being decorated.
+
+    Returns:
+        A function which takes a tuple of positional arguments the handler is
+        called with and returns the ``aiohttp`` request.
+    """
+    parameters = _positional_parameters(func)
+    if parameters is not None:
+        qualname = getattr(func, '__qualname__', '').split('.')
+        in_class = len(qualname) > 1 and qualname[-2] != '<locals>'
+
+        if in_class and parameters == ['self']:
+            return _view_request
+
+        if in_class and len(parameters) == 2:
+            return itemgetter(-1)
+
+    return _any_request
+
+
+_MARKER = '_aiohttp_auth_marker'
+
+
+def mark_middleware(middleware, *installs):
+    """Record what a middleware factory installs.
+
+    Args:
+        middleware: Middleware factory to mark.
+        installs: ``(kind, target)`` pairs, where kind is the name of the
+            middleware (``'auth'``, ``'acl'``, ``'autz'``) and target is the
+            policy or callback it installs.
+
+    Returns:
+        The middleware factory.
+    """
+    setattr(middleware, _MARKER, installs)
+    return middleware
+
+
+def is_installed(app, kind, target):
+    """Check if a middleware installing target is already set up for app.
+
+    Args:
+        app: aiohttp Application object.
+        kind: Name of the middleware (``'auth'``, ``'acl'``, ``'autz'``).
+        target: The policy or callback installed by the middleware.
+
+    Returns:
+        ``True`` if one of the app middlewares marked by ``mark_middleware``
+        installs the same target with the same kind.
+    """
+    for middleware in app.middlewares:
+        for installed_kind, installed_target in getattr(middleware, _MARKER,
+                                                        ()):
+            if installed_kind == kind and installed_target is target:
+                return True
+
+    return False
@@ -1,13 +1,84 @@
 """Pytest configuration."""
 import os.path
+import aiohttp
 import pytest
 import sys
-from utils import assert_middleware
+from utils import SECRET, assert_middleware
 
+try:
+    import uvloop
+except ImportError:  # pragma: no cover
+    uvloop = None
 
 my_path = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(my_path, '..'))
 
+from aiohttp_auth import auth  # noqa: E402
+
+
+_LOOP_OPTIONS = {'--aiohttp-loop': 'aiohttp_loop', '--loop': 'loop'}
+
+
+def pytest_configure(config):
+    """Run tests with uvloop if it is installed.
+
+    The loop fixture of the aiohttp pytest plugin sets up its own event loop
+    policy for every test, so uvloop is chosen through the plugin loop option
+    instead of a global policy. The option is only set if it is not given on
+    the command line (or in ``PYTEST_ADDOPTS``), so e.g.
+    ``--aiohttp-loop=pyloop`` still runs tests with the default loop.
+    """
+    if uvloop is None:
+        return  # pragma: no cover
+
+    args = list(config.invocation_params.args)
+    args.extend(os.environ.get('PYTEST_ADDOPTS', '').split())
+    given = {arg.split('=', 1)[0] for arg in args}
+
+    # the option is --aiohttp-loop since aiohttp 3.0 and --loop before
+    for flag, name in _LOOP_OPTIONS.items():
+        if hasattr(config.option, name) and flag not in given:
+            setattr(config.option, name, 'uvloop')
+
+
+@pytest.fixture(scope='module')
+def cookie_policy():
+    """Cookie ticket authentication policy shared by tests of a module.
+
+    Policies hold no per request state, so there is no need to create one
+    for every test.
+    """
+    return auth.CookieTktAuthentication(SECRET, 15,
+                                        cookie_name='auth')
+
+
+@pytest.fixture(scope='module')
+def reissue_cookie_policy():
+    """Cookie ticket authentication policy reissuing ticket on any request."""
+    return auth.CookieTktAuthentication(SECRET, 15, 0,
+                                        cookie_name='auth')
+
+
+@pytest.fixture(scope='module')
+def session_policy():
+    """Session ticket authentication policy shared by tests of a module."""
+    return auth.SessionTktAuthentication(SECRET, 15,
+                                         cookie_name='auth')
+
+
+@pytest.fixture
+def configured_cookie_app(app, cookie_policy):
+    """Fixture to get the app of a test module with cookie_policy set up.
+
+    Use as follow::
+
+        async def test_something(configured_cookie_app, client):
+            app, policy = configured_cookie_app
+            ...
+    """
+    auth.setup(app, cookie_policy)
+    return app, cookie_policy
+
 
 @pytest.fixture
 def client(loop, test_client):
@@ -21,9 +92,12 @@ def client(loop, test_client):
             ...
             cli = await client(app)
             response = await cli.get('/some/path')
+
+    Requests of a test share keep-alive connections of the client connector.
     """
     async def go(app):
         app.middlewares.append(assert_middleware)
-        return await test_client(app)
+        connector = aiohttp.TCPConnector(limit=10, keepalive_timeout=30)
+        return await test_client(app, connector=connector)
 
     yield go
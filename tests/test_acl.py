@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import aiohttp_session
 from aiohttp import web
@@ -8,7 +9,7 @@ from utils import assert_response
 
 
 @pytest.fixture
-def app(loop):
+def app(loop, session_policy):
     """Default app fixture for tests."""
     async def handler_remember(request):
         await auth.remember(request, 'some_user')
@@ -16,12 +17,10 @@ def app(loop):
 
     application = web.Application(loop=loop)
 
-    secret = b'01234567890abcdef'
     storage = aiohttp_session.SimpleCookieStorage()
-    policy = auth.SessionTktAuthentication(secret, 15, cookie_name='auth')
 
     aiohttp_session.setup(application, storage)
-    auth.setup(application, policy)
+    auth.setup(application, session_policy)
 
     application.router.add_get('/remember', handler_remember)
 
@@ -341,3 +340,250 @@ async def test_no_groups_if_none_returned_from_callback_with_abc(app, client):
     cli = await client(app)
 
     await assert_response(cli.get('/test'), 'test')
+
+
+async def test_acl_permissions_with_compiled_context(app, client):
+    raw_context = [(Permission.Allow, 'group0', ('test0',)),
+                   (Permission.Deny, 'group1', ('test1',)),
+                   (Permission.Allow, Group.Everyone, ('test1', 'test2'))]
+
+    async def handler_test(request):
+        for context in (acl.ACLContext(raw_context),
+                        acl.NaiveACLContext(raw_context)):
+            assert (await acl.get_permitted(request, 'test0',
+                                            context)) is True
+            assert (await acl.get_permitted(request, 'test1',
+                                            context)) is False
+            assert (await acl.get_permitted(request, 'test2',
+                                            context)) is True
+            assert (await acl.get_permitted(request, 'test3',
+                                            context)) is False
+
+        return web.Response(text='test')
+
+    acl.setup(app, _groups_callback)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    await assert_response(cli.get('/test'), 'test')
+
+
+async def test_acl_required_decorator_caches_callable_context(app, client):
+    calls = []
+
+    async def context():
+        calls.append(None)
+        return [(Permission.Allow, 'group0', ('test0',))]
+
+    @acl.acl_required('test0', context, cache_ttl=60)
+    async def handler_test(request):
+        return web.Response(text='test')
+
+    acl.setup(app, _groups_callback)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    await assert_response(cli.get('/test'), 'test')
+    await assert_response(cli.get('/test'), 'test')
+
+    assert len(calls) == 1
+
+
+async def test_acl_required_decorator_refreshes_cached_context_once(app,
+                                                                   client):
+    calls = []
+
+    async def slow_context():
+        calls.append(None)
+        # let the other requests miss the cache while this one refreshes it
+        await asyncio.sleep(0.05)
+        return [(Permission.Allow, 'group0', ('test0',))]
+
+    @acl.acl_required('test0', slow_context, cache_ttl=60)
+    async def handler_test(request):
+        return web.Response(text='test')
+
+    acl.setup(app, _groups_callback)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    await asyncio.gather(*(assert_response(cli.get('/test'), 'test')
+                           for _ in range(5)))
+
+    assert len(calls) == 1
+
+
+async def test_acl_required_decorator_does_not_cache_failed_context(app,
+                                                                    client):
+    calls = []
+
+    async def failing_context():
+        calls.append(None)
+        if len(calls) == 1:
+            raise ValueError('context is not available')
+
+        return [(Permission.Allow, 'group0', ('test0',))]
+
+    @acl.acl_required('test0', failing_context, cache_ttl=60)
+    async def handler_test(request):
+        return web.Response(text='test')
+
+    acl.setup(app, _groups_callback)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    response = await cli.get('/test')
+    assert response.status == 500
+
+    # the lock is released and the context is called again
+    await asyncio.wait_for(assert_response(cli.get('/test'), 'test'), 1)
+    await assert_response(cli.get('/test'), 'test')
+
+    assert len(calls) == 2
+
+
+async def test_groups_callback_called_once_per_request(app, client):
+    calls = []
+
+    async def _counting_groups_callback(user_id):
+        calls.append(user_id)
+        return ('group0', )
+
+    context = [(Permission.Allow, 'group0', ('test0',))]
+
+    async def handler_test(request):
+        assert (await acl.get_permitted(request, 'test0', context)) is True
+        assert (await acl.get_permitted(request, 'test1', context)) is False
+        assert 'group0' in (await acl.get_user_groups(request))
+
+        return web.Response(text='test')
+
+    acl.setup(app, _counting_groups_callback)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    await assert_response(cli.get('/test'), 'test')
+    assert len(calls) == 1
+
+    await assert_response(cli.get('/test'), 'test')
+    assert len(calls) == 2
+
+
+async def test_groups_looked_up_again_after_remember(app, client):
+    context = [(Permission.Allow, Group.AuthenticatedUser, ('test0',))]
+
+    async def handler_test(request):
+        assert (await acl.get_permitted(request, 'test0', context)) is False
+
+        await auth.remember(request, 'bob')
+        assert (await acl.get_permitted(request, 'test0', context)) is True
+
+        await auth.forget(request)
+        assert (await acl.get_permitted(request, 'test0', context)) is False
+
+        return web.Response(text='test')
+
+    acl.setup(app, _auth_groups_callback)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    await assert_response(cli.get('/test'), 'test')
+
+
+async def test_acl_required_decorator_with_empty_context(app, client):
+    calls = []
+
+    async def _counting_groups_callback(user_id):
+        calls.append(user_id)  # pragma: no cover
+
+    @acl.acl_required('test0', [])
+    async def handler_test(request):
+        return web.Response(text='test')  # pragma: no cover
+
+    acl.setup(app, _counting_groups_callback)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    response = await cli.get('/test')
+    assert response.status == 403
+    assert calls == []
+
+
+async def test_acl_required_decorator_with_callable_context(app, client):
+    context = [(Permission.Allow, 'group0', ('test0',))]
+
+    def sync_context():
+        return context
+
+    async def async_context():
+        return context
+
+    class ContextCallback:
+        calls = 0
+
+        def __call__(self):
+            # return a plain value and an awaitable in turn
+            self.calls += 1
+            return context if self.calls % 2 else async_context()
+
+    @acl.acl_required('test0', sync_context)
+    async def handler_sync(request):
+        return web.Response(text='sync')
+
+    @acl.acl_required('test0', async_context)
+    async def handler_async(request):
+        return web.Response(text='async')
+
+    @acl.acl_required('test0', ContextCallback())
+    async def handler_callback(request):
+        return web.Response(text='callback')
+
+    @acl.acl_required('test1', async_context)
+    async def handler_forbidden(request):
+        return web.Response(text='forbidden')  # pragma: no cover
+
+    acl.setup(app, _groups_callback)
+    app.router.add_get('/sync', handler_sync)
+    app.router.add_get('/async', handler_async)
+    app.router.add_get('/callback', handler_callback)
+    app.router.add_get('/forbidden', handler_forbidden)
+
+    cli = await client(app)
+
+    await assert_response(cli.get('/sync'), 'sync')
+    await assert_response(cli.get('/async'), 'async')
+    await assert_response(cli.get('/callback'), 'callback')
+    await assert_response(cli.get('/callback'), 'callback')
+    await assert_response(cli.get('/callback'), 'callback')
+
+    response = await cli.get('/forbidden')
+    assert response.status == 403
+
+
+def test_freeze_context():
+    raw_context = [(Permission.Allow, 'group0', ('test0',))]
+
+    context = acl.freeze_context(raw_context)
+
+    assert isinstance(context, acl.ACLContext)
+    assert acl.freeze_context(context) is context
+    assert context.permit({'group0', }, 'test0') is True
+
+    naive_context = acl.NaiveACLContext(raw_context)
+    assert acl.freeze_context(naive_context) is naive_context
+
+
+def test_contexts_take_string_permissions_as_single_permission():
+    raw_context = [(Permission.Allow, 'group0', 'edit')]
+
+    for context in (acl.ACLContext(raw_context),
+                    acl.NaiveACLContext(raw_context)):
+        assert context.permit({'group0', }, 'edit') is True
+        assert context.permit({'group0', }, 'ed') is False
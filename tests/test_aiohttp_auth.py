@@ -1,18 +1,21 @@
 import aiohttp_auth
 import aiohttp_session
+import pytest
 from aiohttp import web
 from aiohttp_auth import autz, auth
 from aiohttp_auth.autz.policy import acl
+from aiohttp_auth.permissions import Group, Permission
+from aiohttp_auth.utils import request_getter
+from utils import SECRET, assert_response
 
 
 async def test_aiohttp_auth_middleware_setup(loop):
     app = web.Application(loop=loop)
 
-    secret = b'01234567890abcdef'
     storage = aiohttp_session.SimpleCookieStorage()
     aiohttp_session.setup(app, storage)
 
-    auth_policy = auth.SessionTktAuthentication(secret, 15,
+    auth_policy = auth.SessionTktAuthentication(SECRET, 15,
                                                 cookie_name='auth')
 
     class ACLAutzPolicy(acl.AbstractACLAutzPolicy):
@@ -28,3 +31,199 @@ async def test_aiohttp_auth_middleware_setup(loop):
 
     middleware = autz.autz_middleware(autz_policy)
     assert app.middlewares[-1].__name__ == middleware.__name__
+
+
+def test_request_getter():
+    async def handler(request):
+        pass  # pragma: no cover
+
+    class Handlers:
+        async def handler(self, request):
+            pass  # pragma: no cover
+
+        @staticmethod
+        async def static_handler(request):
+            pass  # pragma: no cover
+
+    def logged(func):
+        # a decorator which does not use functools.wraps
+        async def inner(view):
+            pass  # pragma: no cover
+
+        return inner
+
+    class MyView(web.View):
+        async def get(self):
+            pass  # pragma: no cover
+
+        @logged
+        async def post(self):
+            pass  # pragma: no cover
+
+    request = object()
+    view = MyView.__new__(MyView)
+    view._request = request
+
+    assert request_getter(handler)((request, )) is request
+    assert request_getter(Handlers.handler)((Handlers(), request)) is request
+    assert request_getter(Handlers.static_handler)((request, )) is request
+    assert request_getter(MyView.get)((view, )) is request
+    assert request_getter(MyView.post)((view, )) is request
+    assert request_getter(lambda *args: None)((view, )) is request
+
+
+def test_decorators_keep_handler_attributes():
+    async def handler(request):
+        """Handler docstring."""
+        pass  # pragma: no cover
+
+    handler.attribute = True
+
+    context = [(Permission.Allow, Group.Everyone, ('test0', ))]
+    decorators = (auth.auth_required,
+                  aiohttp_auth.acl.acl_required('test0', context),
+                  autz.autz_required('test0'))
+    for decorator in decorators:
+        wrapper = decorator(handler)
+
+        assert wrapper.__name__ == handler.__name__
+        assert wrapper.__doc__ == handler.__doc__
+        assert wrapper.__wrapped__ is handler
+        assert wrapper.attribute is True
+
+
+async def test_aiohttp_auth_combined_middleware(loop, client):
+    async def handler_remember(request):
+        await auth.remember(request, 'some_user')
+        return web.Response(text='remember')
+
+    @autz.autz_required('test0')
+    async def handler_test(request):
+        assert (await auth.get_auth(request)) == 'some_user'
+        return web.Response(text='test')
+
+    app = web.Application(loop=loop)
+
+    auth_policy = auth.CookieTktAuthentication(SECRET, 15,
+                                               cookie_name='auth')
+
+    class ACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        async def acl_groups(self, user_identity):
+            return ()
+
+    context = [(Permission.Allow, Group.AuthenticatedUser, {'test0', })]
+    autz_policy = ACLAutzPolicy(context)
+
+    aiohttp_auth.setup_combined(app, auth_policy, autz_policy)
+
+    middleware = aiohttp_auth.auth_autz_middleware(auth_policy, autz_policy)
+    assert app.middlewares[-1].__name__ == middleware.__name__
+
+    app.router.add_get('/remember', handler_remember)
+    app.router.add_get('/test', handler_test)
+
+    cli = await client(app)
+
+    response = await cli.get('/test')
+    assert response.status == 403
+
+    await assert_response(cli.get('/remember'), 'remember')
+    await assert_response(cli.get('/test'), 'test')
+
+
+def test_permissions_use_identity_hash():
+    for member in (Group.Everyone, Group.AuthenticatedUser,
+                   Permission.Allow, Permission.Deny):
+        assert hash(member) == object.__hash__(member)
+
+    assert Group('aiohttp_auth.acl.group.Everyone') is Group.Everyone
+    assert Permission(True) is Permission.Allow
+
+
+async def test_aiohttp_auth_middleware_setup_with_acl_callback(loop):
+    app = web.Application(loop=loop)
+
+    auth_policy = auth.CookieTktAuthentication(SECRET, 15,
+                                               cookie_name='auth')
+
+    async def acl_groups_callback(user_id):
+        return None  # pragma: no cover
+
+    aiohttp_auth.setup(app, auth_policy, acl_groups_callback)
+
+    middleware = auth.auth_middleware(auth_policy)
+    assert app.middlewares[-2].__name__ == middleware.__name__
+
+    middleware = aiohttp_auth.acl.acl_middleware(acl_groups_callback)
+    assert app.middlewares[-1].__name__ == middleware.__name__
+
+
+async def test_aiohttp_auth_middleware_setup_rejects_unknown_policy(loop):
+    app = web.Application(loop=loop)
+
+    auth_policy = auth.CookieTktAuthentication(SECRET, 15,
+                                               cookie_name='auth')
+
+    class NotAutzPolicy:
+        async def permit(self, user_identity, permission, context=None):
+            return True  # pragma: no cover
+
+    for autz_policy in (None, NotAutzPolicy()):
+        with pytest.raises(TypeError):
+            aiohttp_auth.setup(app, auth_policy, autz_policy)
+
+    assert not app.middlewares
+
+
+async def test_setup_is_idempotent(loop):
+    app = web.Application(loop=loop)
+
+    auth_policy = auth.CookieTktAuthentication(SECRET, 15,
+                                               cookie_name='auth')
+
+    class ACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        async def acl_groups(self, user_identity):
+            return None  # pragma: no cover
+
+    autz_policy = ACLAutzPolicy()
+
+    aiohttp_auth.setup(app, auth_policy, autz_policy)
+    aiohttp_auth.setup(app, auth_policy, autz_policy)
+    aiohttp_auth.setup_combined(app, auth_policy, autz_policy)
+    auth.setup(app, auth_policy)
+    autz.setup(app, autz_policy)
+
+    assert len(app.middlewares) == 2
+
+    other_autz_policy = ACLAutzPolicy()
+    autz.setup(app, other_autz_policy)
+
+    assert len(app.middlewares) == 3
+
+
+async def test_setup_combined_installs_missing_middleware_only(loop):
+    def installs(middleware):
+        return getattr(middleware, '_aiohttp_auth_marker')
+
+    auth_policy = auth.CookieTktAuthentication(SECRET, 15,
+                                               cookie_name='auth')
+
+    class ACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        async def acl_groups(self, user_identity):
+            return None  # pragma: no cover
+
+    autz_policy = ACLAutzPolicy()
+
+    app = web.Application(loop=loop)
+    auth.setup(app, auth_policy)
+    aiohttp_auth.setup_combined(app, auth_policy, autz_policy)
+
+    assert len(app.middlewares) == 2
+    assert installs(app.middlewares[-1]) == (('autz', autz_policy), )
+
+    app = web.Application(loop=loop)
+    autz.setup(app, autz_policy)
+    aiohttp_auth.setup_combined(app, auth_policy, autz_policy)
+
+    assert len(app.middlewares) == 2
+    assert installs(app.middlewares[-1]) == (('auth', auth_policy), )
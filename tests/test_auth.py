@@ -1,74 +1,133 @@
-import asyncio
-from os import urandom
+import json
+import time
 import pytest
 from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
 from aiohttp_auth import auth
+from aiohttp_auth.auth import ticket_auth
+from aiohttp_auth.auth.abstract_auth import AbstractAuthentication
+from aiohttp_auth.auth.auth import AUTH_KEY, POLICY_KEY
 import aiohttp_session
-from utils import assert_response
+from utils import SECRET, DummyStorage, assert_response
+
+
+async def handler_remember(request):
+    await auth.remember(request, 'some_user')
+    return web.Response(text='remember')
+
+
+async def handler_auth(request):
+    user_id = await auth.get_auth(request)
+    assert user_id == 'some_user'
+    assert user_id == await auth.get_auth(request)
+    return web.Response(text='auth')
+
+
+async def handler_forget(request):
+    user_id = await auth.get_auth(request)
+    assert user_id == 'some_user'
+    await auth.forget(request)
+    return web.Response(text='forget')
+
+
+# Applications are frozen once they are served, so every test gets a new one,
+# but the handlers are shared.
+ROUTES = (('/remember', handler_remember),
+          ('/auth', handler_auth),
+          ('/forget', handler_forget))
 
 
 @pytest.fixture
 def app(loop):
     """Default app fixture for tests."""
-    async def handler_remember(request):
-        await auth.remember(request, 'some_user')
-        return web.Response(text='remember')
+    application = web.Application(loop=loop)
+    for path, handler in ROUTES:
+        application.router.add_get(path, handler)
 
-    async def handler_auth(request):
-        user_id = await auth.get_auth(request)
-        assert user_id == 'some_user'
-        assert user_id == await auth.get_auth(request)
-        return web.Response(text='auth')
+    yield application
 
-    async def handler_forget(request):
-        user_id = await auth.get_auth(request)
-        assert user_id == 'some_user'
-        await auth.forget(request)
-        return web.Response(text='forget')
 
-    application = web.Application(loop=loop)
-    application.router.add_get('/remember', handler_remember)
-    application.router.add_get('/auth', handler_auth)
-    application.router.add_get('/forget', handler_forget)
+class FakeClock:
+    """Clock to replace the time module used by ticket authentication."""
 
-    yield application
+    def __init__(self):
+        self.now = time.time()
 
+    def time(self):
+        return self.now
 
-async def test_middleware_setup(app):
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 15, cookie_name='auth')
+    def tick(self, seconds):
+        self.now += seconds
+
+
+def session_data(response, storage):
+    """Return the session data stored in SimpleCookieStorage cookie."""
+    value = response.cookies[storage.cookie_name].value
+    # an empty session is stored without the session key
+    return json.loads(value).get('session', {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fixture to move time of ticket authentication without waiting."""
+    fake_clock = FakeClock()
+    monkeypatch.setattr(ticket_auth, 'time', fake_clock)
+    return fake_clock
 
-    auth.setup(app, policy)
+
+async def test_middleware_setup(configured_cookie_app):
+    app, policy = configured_cookie_app
 
     middleware = auth.auth_middleware(policy)
 
     assert app.middlewares[-1].__name__ == middleware.__name__
 
 
-async def test_no_middleware_installed(app, client):
-    async def handler_test(request):
-        with pytest.raises(RuntimeError) as ex_info:
-            await auth.get_auth(request)
+async def test_no_middleware_installed(app):
+    request = make_mocked_request('GET', '/test', app=app)
 
-        assert str(ex_info.value) == 'auth_middleware not installed'
+    with pytest.raises(RuntimeError) as ex_info:
+        await auth.get_auth(request)
 
-        with pytest.raises(RuntimeError) as ex_info:
-            await auth.remember(request, 'some_user')
+    assert str(ex_info.value) == 'auth_middleware not installed'
 
-        assert str(ex_info.value) == 'auth_middleware not installed'
+    with pytest.raises(RuntimeError) as ex_info:
+        await auth.remember(request, 'some_user')
 
-        with pytest.raises(RuntimeError) as ex_info:
-            await auth.forget(request)
+    assert str(ex_info.value) == 'auth_middleware not installed'
 
-        assert str(ex_info.value) == 'auth_middleware not installed'
+    with pytest.raises(RuntimeError) as ex_info:
+        await auth.forget(request)
 
-        return web.Response(text='test')
+    assert str(ex_info.value) == 'auth_middleware not installed'
 
-    app.router.add_get('/test', handler_test)
 
-    cli = await client(app)
+async def test_get_auth_is_cached_in_request(app):
+    class Policy(AbstractAuthentication):
+        calls = 0
 
-    await assert_response(cli.get('/test'), 'test')
+        async def remember(self, request, user_id):
+            pass
+
+        async def forget(self, request):
+            pass  # pragma: no cover
+
+        async def get(self, request):
+            self.calls += 1
+            return None
+
+    policy = Policy()
+    request = make_mocked_request('GET', '/test', app=app)
+    request[POLICY_KEY] = policy
+
+    assert await auth.get_auth(request) is None
+    assert await auth.get_auth(request) is None
+    assert policy.calls == 1
+
+    await auth.remember(request, 'some_user')
+
+    assert await auth.get_auth(request) is None
+    assert policy.calls == 2
 
 
 async def test_middleware_installed_no_session(app, client):
@@ -79,18 +138,17 @@ async def test_middleware_installed_no_session(app, client):
         return web.Response(text='test')
 
     app.router.add_get('/test', handler_test)
-    aiohttp_session.setup(app, aiohttp_session.SimpleCookieStorage())
-    auth.setup(app, auth.SessionTktAuthentication(urandom(16), 15))
+    aiohttp_session.setup(app, DummyStorage())
+    auth.setup(app, auth.SessionTktAuthentication(SECRET, 15))
 
     cli = await client(app)
 
     await assert_response(cli.get('/test'), 'test')
 
 
-async def test_middleware_stores_auth_in_session(app, client):
-    secret = b'01234567890abcdef'
+async def test_middleware_stores_auth_in_session(app, client, session_policy):
+    policy = session_policy
     storage = aiohttp_session.SimpleCookieStorage()
-    policy = auth.SessionTktAuthentication(secret, 15, cookie_name='auth')
 
     aiohttp_session.setup(app, storage)
     auth.setup(app, policy)
@@ -100,14 +158,12 @@ async def test_middleware_stores_auth_in_session(app, client):
     text = await response.text()
     assert text == 'remember'
 
-    value = response.cookies.get(storage.cookie_name).value
-    assert policy.cookie_name in value
+    assert policy.cookie_name in session_data(response, storage)
 
 
-async def test_middleware_gets_auth_from_session(app, client):
-    secret = b'01234567890abcdef'
+async def test_middleware_gets_auth_from_session(app, client, session_policy):
+    policy = session_policy
     storage = aiohttp_session.SimpleCookieStorage()
-    policy = auth.SessionTktAuthentication(secret, 15, cookie_name='auth')
 
     aiohttp_session.setup(app, storage)
     auth.setup(app, policy)
@@ -120,11 +176,9 @@ async def test_middleware_gets_auth_from_session(app, client):
     await assert_response(cli.get('/auth'), 'auth')
 
 
-async def test_middleware_stores_auth_in_cookie(app, client):
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 15, cookie_name='auth')
-
-    auth.setup(app, policy)
+async def test_middleware_stores_auth_in_cookie(configured_cookie_app,
+                                                client):
+    app, policy = configured_cookie_app
 
     cli = await client(app)
 
@@ -135,11 +189,9 @@ async def test_middleware_stores_auth_in_cookie(app, client):
     assert policy.cookie_name in response.cookies
 
 
-async def test_middleware_gets_auth_from_cookie(app, client):
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 15, 2, cookie_name='auth')
-
-    auth.setup(app, policy)
+async def test_middleware_gets_auth_from_cookie(configured_cookie_app,
+                                                client):
+    app, policy = configured_cookie_app
 
     cli = await client(app)
 
@@ -152,10 +204,9 @@ async def test_middleware_gets_auth_from_cookie(app, client):
     await assert_response(cli.get('/auth'), 'auth')
 
 
-@pytest.mark.slow
-async def test_middleware_reissues_ticket_auth(loop, app, client):
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 15, 0, cookie_name='auth')
+async def test_middleware_reissues_ticket_auth(app, client, clock,
+                                               reissue_cookie_policy):
+    policy = reissue_cookie_policy
 
     auth.setup(app, policy)
 
@@ -167,23 +218,22 @@ async def test_middleware_reissues_ticket_auth(loop, app, client):
     assert text == 'remember'
     data = response.cookies[policy.cookie_name]
 
-    # wait a second that the ticket value has changed
-    await asyncio.sleep(1.0, loop=loop)
+    # move the clock forward that the ticket value has changed
+    clock.tick(2)
 
     response = await assert_response(cli.get('/auth'), 'auth')
 
     assert data != response.cookies[policy.cookie_name]
 
 
-@pytest.mark.slow
-async def test_middleware_doesnt_reissue_on_bad_response(loop, app, client):
+async def test_middleware_doesnt_reissue_on_bad_response(
+        app, client, clock, reissue_cookie_policy):
     async def handler_bad_response(request):
         user_id = await auth.get_auth(request)
         assert user_id == 'some_user'
         return web.Response(status=400, text='bad_response')
 
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 15, 0, cookie_name='auth')
+    policy = reissue_cookie_policy
 
     auth.setup(app, policy)
     app.router.add_get('/bad_response', handler_bad_response)
@@ -196,15 +246,15 @@ async def test_middleware_doesnt_reissue_on_bad_response(loop, app, client):
 
     assert text == 'remember'
 
-    # wait a second that the ticket value has changed
-    await asyncio.sleep(1.0, loop=loop)
+    # move the clock forward that the ticket value has changed
+    clock.tick(2)
 
     response = await assert_response(cli.get('/auth'), 'auth')
 
     assert data != response.cookies[policy.cookie_name]
     data = response.cookies[policy.cookie_name]
 
-    await asyncio.sleep(1.0, loop=loop)
+    clock.tick(2)
 
     response = await assert_response(cli.get('/bad_response'), 'bad_response')
 
@@ -212,10 +262,9 @@ async def test_middleware_doesnt_reissue_on_bad_response(loop, app, client):
     assert policy.cookie_name not in response.cookies
 
 
-async def test_middleware_forget_with_session(app, client):
-    secret = b'01234567890abcdef'
+async def test_middleware_forget_with_session(app, client, session_policy):
+    policy = session_policy
     storage = aiohttp_session.SimpleCookieStorage()
-    policy = auth.SessionTktAuthentication(secret, 15, cookie_name='auth')
 
     aiohttp_session.setup(app, storage)
     auth.setup(app, policy)
@@ -223,22 +272,17 @@ async def test_middleware_forget_with_session(app, client):
     cli = await client(app)
 
     response = await assert_response(cli.get('/remember'), 'remember')
-    value = response.cookies.get(storage.cookie_name).value
-    assert policy.cookie_name in value
+    assert policy.cookie_name in session_data(response, storage)
 
     response = await assert_response(cli.get('/forget'), 'forget')
-    value = response.cookies.get(storage.cookie_name).value
-    assert policy.cookie_name not in value
+    assert policy.cookie_name not in session_data(response, storage)
 
     with pytest.raises(AssertionError):
         await assert_response(cli.get('/auth'), 'auth')
 
 
-async def test_middleware_forget_with_cookies(app, client):
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 120, cookie_name='auth')
-
-    auth.setup(app, policy)
+async def test_middleware_forget_with_cookies(configured_cookie_app, client):
+    app, policy = configured_cookie_app
 
     cli = await client(app)
 
@@ -254,38 +298,34 @@ async def test_middleware_forget_with_cookies(app, client):
         await assert_response(cli.get('/auth'), 'auth')
 
 
-async def test_middleware_auth_required_decorator(app, client):
+async def test_middleware_auth_required_decorator(app, cookie_policy):
     @auth.auth_required
     async def handler_test(request):
         return web.Response(text='test')
 
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 120, cookie_name='auth')
+    # the view test below goes through the server, here the handler is run
+    # with the auth middleware only
+    handler = await auth.auth_middleware(cookie_policy)(app, handler_test)
 
-    auth.setup(app, policy)
-    app.router.add_get('/test', handler_test)
-
-    cli = await client(app)
-
-    response = await assert_response(cli.get('/test'), '401: Unauthorized')
-    assert response.status == 401
+    request = make_mocked_request('GET', '/test', app=app)
+    with pytest.raises(web.HTTPUnauthorized):
+        await handler(request)
 
-    response = await assert_response(cli.get('/remember'), 'remember')
-
-    response = await assert_response(cli.get('/test'), 'test')
+    request = make_mocked_request('GET', '/test', app=app)
+    request[AUTH_KEY] = 'some_user'
+    response = await handler(request)
     assert response.status == 200
+    assert response.text == 'test'
 
 
-async def test_middleware_auth_required_decorator_with_view(app, client):
+async def test_middleware_auth_required_decorator_with_view(
+        configured_cookie_app, client):
     class MyView(web.View):
         @auth.auth_required
         async def get(self):
             return web.Response(text='test')
 
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 120, cookie_name='auth')
-
-    auth.setup(app, policy)
+    app, _ = configured_cookie_app
     app.router.add_route('*', '/test', MyView)
 
     cli = await client(app)
@@ -300,17 +340,14 @@ async def test_middleware_auth_required_decorator_with_view(app, client):
 
 
 async def test_middleware_cannot_store_auth_in_cookie_when_response_prepared(
-        app, client):
+        configured_cookie_app, client):
     async def handler_test(request):
         await auth.remember(request, 'some_user')
         response = web.Response(text='test')
         await response.prepare(request)
         return response
 
-    secret = b'01234567890abcdef'
-    policy = auth.CookieTktAuthentication(secret, 15, cookie_name='auth')
-
-    auth.setup(app, policy)
+    app, _ = configured_cookie_app
     app.router.add_get('/test', handler_test)
 
     cli = await client(app)
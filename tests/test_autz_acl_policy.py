@@ -1,15 +1,18 @@
+import asyncio
+import sys
 import pytest
 import aiohttp_session
 from aiohttp import web
 from aiohttp_auth import auth, autz
 from aiohttp_auth.autz import autz_required
+from aiohttp_auth.acl import ACLContext, NaiveACLContext
 from aiohttp_auth.autz.policy import acl
 from aiohttp_auth.permissions import Group, Permission
 from utils import assert_response
 
 
 @pytest.fixture
-def app(loop):
+def app(loop, session_policy):
     """Default app fixture for tests."""
     async def handler_remember(request):
         await auth.remember(request, 'some_user')
@@ -17,12 +20,10 @@ def app(loop):
 
     application = web.Application(loop=loop)
 
-    secret = b'01234567890abcdef'
     storage = aiohttp_session.SimpleCookieStorage()
-    policy = auth.SessionTktAuthentication(secret, 15, cookie_name='auth')
 
     aiohttp_session.setup(application, storage)
-    auth.setup(application, policy)
+    auth.setup(application, session_policy)
 
     application.router.add_get('/remember', handler_remember)
 
@@ -357,3 +358,235 @@ async def test_autz_acl_permit():
     assert (await policy.permit(None, 'test2')) is False
     assert (await policy.permit(None, 'test3')) is False
     assert (await policy.permit(None, 'test4')) is False
+
+
+def test_acl_context_matches_naive_acl_context():
+    raw_context = [(Permission.Allow, 'group0', {'test0', 'test2'}),
+                   (Permission.Deny, 'group1', {'test1', }),
+                   (Permission.Allow, 'group0', {'test1', 'test0'}),
+                   (Permission.Allow, Group.Everyone, {'test3', }),
+                   (Permission.Allow, 'group1', 'test4'),
+                   (Permission.Deny, 'group2', {'test5', }),
+                   (Permission.Deny, 'group0', {'test5', }),
+                   (Permission.Allow, 'group1', {'test5', 'test2'}),
+                   (Permission.Deny, Group.Everyone, {'test5', })]
+
+    context = ACLContext(raw_context)
+    naive_context = NaiveACLContext(raw_context)
+
+    for groups in ({'group0'}, {'group1'}, {'group0', 'group1'},
+                   {'group1', 'group2'}, {Group.Everyone}, set()):
+        for permission in ('test0', 'test1', 'test2', 'test3', 'test4',
+                           'test5', 'test'):
+            assert (context.permit(groups, permission) is
+                    naive_context.permit(groups, permission))
+
+
+async def test_autz_acl_policy_compiles_global_context():
+    context = [(Permission.Allow, 'group0', {'test0', })]
+
+    policy = ACLAutzPolicy(context)
+
+    assert isinstance(policy.context, ACLContext)
+    assert (await policy.permit(None, 'test0')) is True
+
+    policy.context = [(Permission.Deny, 'group0', {'test0', })]
+
+    assert (await policy.permit(None, 'test0')) is False
+
+
+def test_extended_groups_are_frozenset():
+    groups = acl.extend_user_groups('some_user', ['group0', 'group0'])
+
+    assert groups == frozenset(('group0', Group.Everyone,
+                                Group.AuthenticatedUser))
+    assert isinstance(groups, frozenset)
+
+
+def test_acl_context_intern_permission():
+    context = ACLContext([(Permission.Allow, 'group0', {'test0', })])
+    permission = ''.join(('test', '0'))
+
+    assert ACLContext.intern_permission(permission) is sys.intern('test0')
+    assert ACLContext.intern_permission(Group.Everyone) is Group.Everyone
+    assert context.permit({'group0', }, permission) is True
+
+
+async def test_autz_acl_policy_permit_with_empty_context():
+    class CountingACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        calls = 0
+
+        async def acl_groups(self, user_identity):
+            self.calls += 1  # pragma: no cover
+
+    policy = CountingACLAutzPolicy([])
+
+    assert len(policy.context) == 0
+    assert (await policy.permit(None, 'test0')) is False
+    assert (await policy.permit(None, 'test0', [])) is False
+    assert policy.calls == 0
+
+
+async def test_autz_acl_policy_shares_concurrent_acl_groups_calls(loop):
+    class SlowACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        calls = 0
+
+        async def acl_groups(self, user_identity):
+            self.calls += 1
+            await asyncio.sleep(0)
+            return ('group0', )
+
+    context = [(Permission.Allow, 'group0', {'test0', })]
+    policy = SlowACLAutzPolicy(context)
+
+    results = await asyncio.gather(*(policy.permit('some_user', 'test0')
+                                     for _ in range(5)))
+
+    assert results == [True] * 5
+    assert policy.calls == 1
+
+    assert (await policy.permit('some_user', 'test0')) is True
+    assert policy.calls == 2
+
+
+async def test_autz_acl_policy_calls_acl_groups_inline(loop):
+    current_task = getattr(asyncio, 'current_task', None)
+    if current_task is None:  # pragma: no cover
+        current_task = asyncio.Task.current_task
+
+    class ACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        tasks = []
+
+        async def acl_groups(self, user_identity):
+            self.tasks.append(current_task())
+            return ('group0', )
+
+    context = [(Permission.Allow, 'group0', {'test0', })]
+    policy = ACLAutzPolicy(context)
+
+    assert (await policy.permit('some_user', 'test0')) is True
+    # no task is created for a single check
+    assert policy.tasks == [current_task()]
+    assert policy._inflight_groups == {}
+
+
+async def test_autz_acl_policy_shares_acl_groups_exception(loop):
+    class FailingACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        calls = 0
+
+        async def acl_groups(self, user_identity):
+            self.calls += 1
+            await asyncio.sleep(0)
+            raise ValueError('no groups')
+
+    context = [(Permission.Allow, 'group0', {'test0', })]
+    policy = FailingACLAutzPolicy(context)
+
+    results = await asyncio.gather(*(policy.permit('some_user', 'test0')
+                                     for _ in range(3)),
+                                   return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert policy.calls == 1
+    assert policy._inflight_groups == {}
+
+    with pytest.raises(ValueError):
+        await policy.permit('some_user', 'test0')
+
+    assert policy.calls == 2
+
+
+async def test_autz_acl_policy_waiter_survives_cancelled_check(loop):
+    class SlowACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        calls = 0
+        event = asyncio.Event()
+
+        async def acl_groups(self, user_identity):
+            self.calls += 1
+            await self.event.wait()
+            return ('group0', )
+
+    context = [(Permission.Allow, 'group0', {'test0', })]
+    policy = SlowACLAutzPolicy(context)
+
+    first = asyncio.ensure_future(policy.permit('some_user', 'test0'))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(policy.permit('some_user', 'test0'))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    policy.event.set()
+
+    assert (await second) is True
+    assert first.cancelled()
+    assert policy.calls == 2
+    assert policy._inflight_groups == {}
+
+
+async def test_autz_acl_policy_with_unhashable_user_identity(loop):
+    class ACLAutzPolicy(acl.AbstractACLAutzPolicy):
+        async def acl_groups(self, user_identity):
+            return ('group{}'.format(user_identity['id']), )
+
+    context = [(Permission.Allow, 'group1', {'test0', })]
+    policy = ACLAutzPolicy(context)
+
+    assert (await policy.permit({'id': 1}, 'test0')) is True
+    assert (await policy.permit({'id': 2}, 'test0')) is False
+
+
+def test_acl_context_with_many_rules_matches_naive_acl_context():
+    raw_context = [(Permission.Allow if i % 3 else Permission.Deny,
+                    'group{}'.format(i % 7), {'test0', 'test{}'.format(i)})
+                   for i in range(40)]
+    raw_context.append((Permission.Allow, Group.Everyone, {'test0', }))
+
+    context = ACLContext(raw_context)
+    naive_context = NaiveACLContext(raw_context)
+
+    for groups in ({Group.Everyone}, {'group1', Group.Everyone},
+                   {'group0', 'group2'}, {'group3', 'group6'}, set()):
+        for permission in ('test0', 'test1', 'test3', 'test39', 'test40'):
+            assert (context.permit(groups, permission) is
+                    naive_context.permit(groups, permission))
+
+
+def test_naive_acl_context_compiles_rules():
+    raw_context = [(Permission.Allow, 'group0', ('test0', 'test2')),
+                   (Permission.Deny, 'group1', 'test1'),
+                   (Permission.Allow, Group.Everyone, ('test1', ))]
+
+    context = NaiveACLContext(raw_context)
+
+    assert context.permit is NaiveACLContext(list(raw_context)).permit
+
+    for groups in ({'group0', Group.Everyone}, {'group1', Group.Everyone},
+                   set()):
+        for permission in ('test0', 'test1', 'test2', 'test'):
+            assert (context.permit(groups, permission) is
+                    acl.get_groups_permitted(groups, permission,
+                                             raw_context))
+
+
+def test_naive_acl_context_falls_back_to_generic_check():
+    unhashable_context = [(Permission.Allow, 'group0', [['test0']])]
+    large_context = [(Permission.Allow, 'group{}'.format(i), ('test0', ))
+                     for i in range(NaiveACLContext.max_unrolled_rules +
+                                    1)]
+
+    for raw_context in (unhashable_context, large_context):
+        context = NaiveACLContext(raw_context)
+
+        assert context.permit.__func__ is NaiveACLContext.permit
+        assert context.permit({'group0', }, 'test0') is (
+            raw_context is large_context)
+
+
+async def test_autz_acl_policy_permit_with_none_groups():
+    context = [(Permission.Allow, Group.Everyone, {'test0', })]
+
+    policy = NoneACLAutzPolicy(context)
+
+    assert (await policy.permit(None, 'test0')) is False
+    assert (await policy.permit('some_user', 'test0', context)) is False
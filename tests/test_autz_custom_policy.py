@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from aiohttp import web
 import aiohttp_session
@@ -11,48 +12,53 @@ class CustomAutzPolicy(AbstractAutzPolicy):
 
     def __init__(self, admin_user_identity):
         self.admin_user_identity = admin_user_identity
+        # permissions not found here are allowed for everyone
+        self._checks = {'admin': self._is_admin}
 
-    async def permit(self, user_identity, permission, context=None):
-        if permission == 'admin':
-            if user_identity == self.admin_user_identity:
-                return True
+    def _is_admin(self, user_identity):
+        return user_identity == self.admin_user_identity
 
-            return False
+    def permit(self, user_identity, permission, context=None):
+        check = self._checks.get(permission)
+        return check is None or check(user_identity)
 
-        return True
 
+async def handler_remember(request):
+    user_identity = request.match_info['user']
+    await auth.remember(request, user_identity)
+    return web.Response(text='remember')
+
+
+@autz_required('admin')
+async def handler_admin(request):
+    return web.Response(text='admin')
 
-@pytest.fixture
-def app(loop):
-    """Default app fixture for tests."""
-    async def handler_remember(request):
-        user_identity = request.match_info['user']
-        await auth.remember(request, user_identity)
-        return web.Response(text='remember')
 
-    @autz_required('admin')
-    async def handler_admin(request):
-        return web.Response(text='admin')
+@autz_required('guest')
+async def handler_guest(request):
+    return web.Response(text='guest')
 
-    @autz_required('guest')
-    async def handler_guest(request):
-        return web.Response(text='guest')
 
+ROUTES = (('/remember/{user}', handler_remember),
+          ('/admin', handler_admin),
+          ('/guest', handler_guest))
+
+
+@pytest.fixture
+def app(loop, session_policy):
+    """Default app fixture for tests."""
     application = web.Application(loop=loop)
 
-    secret = b'01234567890abcdef'
     storage = aiohttp_session.SimpleCookieStorage()
-    policy = auth.SessionTktAuthentication(secret, 15, cookie_name='auth')
 
     aiohttp_session.setup(application, storage)
-    auth.setup(application, policy)
+    auth.setup(application, session_policy)
 
     autz_policy = CustomAutzPolicy(admin_user_identity='alex')
     autz.setup(application, autz_policy)
 
-    application.router.add_get('/remember/{user}', handler_remember)
-    application.router.add_get('/admin', handler_admin)
-    application.router.add_get('/guest', handler_guest)
+    for path, handler in ROUTES:
+        application.router.add_get(path, handler)
 
     yield application
 
@@ -62,8 +68,8 @@ async def test_autz_custom_policy_with_alex_identity(app, client):
     cli = await client(app)
 
     await assert_response(cli.get('/remember/alex'), 'remember')
-    await assert_response(cli.get('/admin'), 'admin')
-    await assert_response(cli.get('/guest'), 'guest')
+    await asyncio.gather(assert_response(cli.get('/admin'), 'admin'),
+                         assert_response(cli.get('/guest'), 'guest'))
 
 
 async def test_autz_custom_policy_with_bob_identity(app, client):
@@ -71,7 +77,7 @@ async def test_autz_custom_policy_with_bob_identity(app, client):
     cli = await client(app)
 
     await assert_response(cli.get('/remember/bob'), 'remember')
-    await assert_response(cli.get('/guest'), 'guest')
 
-    response = await cli.get('/admin')
+    _, response = await asyncio.gather(
+        assert_response(cli.get('/guest'), 'guest'), cli.get('/admin'))
     assert response.status == 403
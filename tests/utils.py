@@ -1,7 +1,14 @@
 """Test utilites."""
+import linecache
 import sys
-import traceback
 from aiohttp import web
+from aiohttp_session import AbstractStorage, Session
+
+
+SECRET = b'01234567890abcdef'
+"""Secret of ticket authentication policies used in tests."""
+
+_ASSERTION_MESSAGE = '\n{0}:{1}\n> {2}\nE {3}\n'
 
 
 async def assert_middleware(app, handler):
@@ -16,12 +23,14 @@ async def assert_middleware(app, handler):
             response = await handler(request)
         except AssertionError as e:
             _, _, tb = sys.exc_info()
-            # traceback.print_tb(tb) # Fixed format
-            tb_info = traceback.extract_tb(tb)
-            filename, line, func, text = tb_info[-1]
-            message = '\n{0}:{1}\n> {2}\nE {3}\n'.format(
-                filename, line, text, str(e)
-            )
+            # only the innermost frame is reported
+            while tb.tb_next is not None:
+                tb = tb.tb_next
+
+            filename = tb.tb_frame.f_code.co_filename
+            line = tb.tb_lineno
+            text = linecache.getline(filename, line).strip()
+            message = _ASSERTION_MESSAGE.format(filename, line, text, e)
             return web.Response(text=message)
 
         return response
@@ -60,8 +69,23 @@ async def assert_response(request, response_text):
         AssertionError: when it was assertion error in tested hanlder.
     """
     response = await request
-    text = await response.text()
-    if text != response_text:
-        raise AssertionError(text)
+    # handlers of the tests respond with utf-8 text, compare it undecoded
+    data = await response.read()
+    if data != response_text.encode('utf-8'):
+        raise AssertionError(data.decode('utf-8', 'replace'))
 
     return response
+
+
+class DummyStorage(AbstractStorage):
+    """Session storage which always loads an empty session and saves nothing.
+
+    Use it for tests which need the session middleware but do not check the
+    session cookie.
+    """
+
+    async def load_session(self, request):
+        return Session(None, data=None, new=True, max_age=self.max_age)
+
+    async def save_session(self, request, response, session):
+        pass